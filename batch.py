@@ -0,0 +1,170 @@
+import os
+import sys
+import json
+import time
+import tempfile
+
+import orjson
+from google import genai
+from google.genai import types
+
+from main import PROMPT_INSTRUCTIONS, REPORT_ADAPTER, get_api_schema, print_report, write_report
+
+# Model used for every request in the batch
+MODEL_NAME = 'gemini-2.0-flash'
+
+# Seconds to wait between batch job status checks
+POLL_INTERVAL = 30
+
+# Terminal states of a batch job, and those that produce a results file
+SUCCEEDED_STATES = frozenset({'JOB_STATE_SUCCEEDED', 'JOB_STATE_PARTIALLY_SUCCEEDED'})
+COMPLETED_STATES = frozenset({
+    'JOB_STATE_SUCCEEDED',
+    'JOB_STATE_PARTIALLY_SUCCEEDED',
+    'JOB_STATE_FAILED',
+    'JOB_STATE_CANCELLED',
+    'JOB_STATE_EXPIRED',
+})
+
+def build_request(client: genai.Client, path: str) -> dict:
+    """
+    Uploads a 10-K PDF and builds its entry for the batch requests file.
+
+    Args:
+        client (genai.Client): The Gemini API client.
+        path (str): The file path to the PDF document.
+
+    Returns:
+        dict: A JSONL entry keyed by the PDF's file name.
+    """
+    uploaded = client.files.upload(file=path, config=types.UploadFileConfig(mime_type='application/pdf'))
+    return {
+        "key": os.path.basename(path),
+        "request": {
+            "contents": [{
+                "role": "user",
+                "parts": [
+                    {"file_data": {"file_uri": uploaded.uri, "mime_type": "application/pdf"}},
+                    {"text": PROMPT_INSTRUCTIONS},
+                ],
+            }],
+            "generation_config": {
+                "response_mime_type": "application/json",
+                "response_schema": get_api_schema(),
+            },
+        },
+    }
+
+def submit_batch(client: genai.Client, paths: list) -> types.BatchJob:
+    """
+    Writes one request per PDF to a JSONL file and submits it as a batch job.
+
+    Args:
+        client (genai.Client): The Gemini API client.
+        paths (list): File paths to the PDF documents.
+
+    Returns:
+        types.BatchJob: The created batch job.
+    """
+    with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8') as f:
+        for path in paths:
+            f.write(json.dumps(build_request(client, path)) + "\n")
+        requests_path = f.name
+
+    try:
+        requests_file = client.files.upload(
+            file=requests_path,
+            config=types.UploadFileConfig(display_name='reports-requests', mime_type='jsonl'),
+        )
+    finally:
+        os.remove(requests_path)
+
+    return client.batches.create(
+        model=MODEL_NAME,
+        src=requests_file.name,
+        config={'display_name': 'reports'},
+    )
+
+def wait_for_batch(client: genai.Client, job: types.BatchJob) -> types.BatchJob:
+    """
+    Polls a batch job until it reaches a terminal state.
+
+    Args:
+        client (genai.Client): The Gemini API client.
+        job (types.BatchJob): The batch job to wait for.
+
+    Returns:
+        types.BatchJob: The batch job in its final state.
+    """
+    while job.state.name not in COMPLETED_STATES:
+        print(f"Batch job {job.name} is {job.state.name}, checking again in {POLL_INTERVAL}s...")
+        time.sleep(POLL_INTERVAL)
+        job = client.batches.get(name=job.name)
+    return job
+
+def parse_results(content: bytes) -> dict:
+    """
+    Parses the batch results file into validated AnnualReport objects.
+
+    Args:
+        content (bytes): The downloaded JSONL results file.
+
+    Returns:
+        dict: AnnualReport objects keyed by the PDF's file name. Entries
+            that failed are reported and left out.
+    """
+    reports = {}
+    for line in content.splitlines():
+        if not line.strip():
+            continue
+        result = orjson.loads(line)
+        key = result.get('key')
+        if 'error' in result:
+            print(f"Request for {key} failed: {result['error']}")
+            continue
+        try:
+            text = result['response']['candidates'][0]['content']['parts'][0]['text']
+            reports[key] = REPORT_ADAPTER.validate_json(text)
+        except Exception as e:
+            print(f"Could not parse the response for {key}: {e}")
+    return reports
+
+# --- Batch execution flow ---
+if __name__ == "__main__":
+    # PDF paths are given on the command line, e.g. python batch.py a.pdf b.pdf
+    paths = sys.argv[1:]
+    if not paths:
+        print("Usage: python batch.py REPORT.pdf [REPORT.pdf ...]")
+        exit()
+
+    missing = [path for path in paths if not os.path.isfile(path)]
+    if missing:
+        print(f"Error: PDF file(s) not found: {', '.join(missing)}")
+        exit()
+
+    # Get the API key from environment variables (main loads the .env file)
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        print("Error: GEMINI_API_KEY environment variable not set.")
+        print("Please create a .env file in the script's directory with GEMINI_API_KEY='YOUR_API_KEY'.")
+        exit()
+
+    client = genai.Client(api_key=api_key)
+
+    try:
+        job = submit_batch(client, paths)
+        print(f"Submitted batch job {job.name} with {len(paths)} report(s).")
+
+        job = wait_for_batch(client, job)
+        if job.state.name not in SUCCEEDED_STATES:
+            print(f"Batch job finished with state {job.state.name}: {job.error}")
+            exit()
+
+        reports = parse_results(client.files.download(file=job.dest.file_name))
+        for key, ar in reports.items():
+            print(f"\nSuccessfully extracted Annual Report data from {key}:")
+            print_report(ar)
+            write_report(ar)
+
+    except Exception as e:
+        print(f"An unexpected error occurred during the Gemini batch job or data processing: {e}")
@@ -1,14 +1,106 @@
+import ctypes
+import hashlib
+import mmap
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import repeat
+
 import tiktoken
-import PyPDF2
+import pypdfium2 as pdfium
 
 
-def load_file(path):
+CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'summarizer')
+
+
+def _read_mapped(path, read, *args):
+    # Hand pdfium the memory-mapped file instead of reading it into Python
+    # bytes. ctypes needs a writable buffer, so the mapping is copy-on-write;
+    # pdfium never writes to it, so the pages stay shared with the page cache.
     with open(path, 'rb') as f:
-        reader = PyPDF2.PdfReader(f)
-        return "".join(page.extract_text() or "" for page in reader.pages)
-    
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    try:
+        return read((ctypes.c_char * len(mm)).from_buffer(mm), *args)
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            # pdfium objects kept alive by an exception traceback still
+            # point into the mapping; it is released once they are collected
+            pass
+
+
+def _page_count(data):
+    pdf = pdfium.PdfDocument(data)
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+
+def _page_text(data, index):
+    pdf = pdfium.PdfDocument(data)
+    try:
+        page = pdf[index]
+        textpage = page.get_textpage()
+        # Image-only pages (covers, graphics) have no characters, so skip
+        # building their text and reuse the count for the range otherwise
+        char_count = textpage.count_chars()
+        text = textpage.get_text_range(count=char_count) if char_count else ""
+        textpage.close()
+        page.close()
+        return text
+    finally:
+        pdf.close()
+
+
+def _extract_page(path, index):
+    return _read_mapped(path, _page_text, index)
+
+
+def load_file(path):
+    n = _read_mapped(path, _page_count)
+    with ProcessPoolExecutor() as executor:
+        # Drop pages without text here rather than branching per page
+        return list(filter(None, executor.map(_extract_page, repeat(path), range(n), chunksize=8)))
+
+
+@lru_cache(maxsize=None)
+def get_encoding(model):
+    return tiktoken.encoding_for_model(model)
+
+
+def _cache_path(path):
+    digest = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()
+    return os.path.join(CACHE_DIR, f"{digest}.pkl")
+
+
+def count_tokens(path, model='gpt-4o'):
+    # Reuse the text and token count from a previous run as long as the
+    # PDF has not changed since (same mtime and size) and the same model
+    # tokenizer is requested.
+    key = (os.path.getmtime(path), os.path.getsize(path), model)
+    cache_file = _cache_path(path)
+    try:
+        with open(cache_file, 'rb') as f:
+            cached = pickle.load(f)
+        if key in cached:
+            return cached[key][1]
+    except (OSError, pickle.UnpicklingError, EOFError):
+        pass
+
+    # Encode page by page so tiktoken can spread the work over its threads.
+    pages = load_file(path)
+    encoded_pages = get_encoding(model).encode_batch(pages, num_threads=os.cpu_count() or 1)
+    token_count = sum(map(len, encoded_pages))
+    text = "\n".join(pages)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(cache_file, 'wb') as f:
+        pickle.dump({key: (text, token_count)}, f)
+    return token_count
 
-text = load_file('meta_10k.pdf')
-encoded_text=tiktoken.encoding_for_model('gpt-4o')
 
-print(len(encoded_text.encode(text)))
+if __name__ == "__main__":
+    print(count_tokens('meta_10k.pdf'))
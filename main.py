@@ -1,42 +1,33 @@
 import os
+import sys
 import json
+import asyncio
 from datetime import datetime
+from functools import cache
+from html import escape
 from typing import List, Optional
 
-import PyPDF2
-import google.generativeai as genai
+import orjson
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
-
-from markdown import markdown
-from weasyprint import HTML
+from pydantic import BaseModel, Field, TypeAdapter
 
 # Load environment variables from a .env file (e.g., for GEMINI_API_KEY)
 # Ensure you have a .env file in the same directory as this script
 # with a line like: GEMINI_API_KEY='YOUR_ACTUAL_GEMINI_API_KEY_HERE'
 load_dotenv()
 
-def load_file(path: str) -> str:
-    """
-    Loads text content from a PDF file.
+# Cleaned response schema persisted next to this script, so later runs can
+# load it instead of regenerating it from the Pydantic model
+SCHEMA_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api_schema.json')
 
-    Args:
-        path (str): The file path to the PDF document.
+# Maximum number of reports sent to the Gemini API at the same time
+MAX_CONCURRENCY = 8
 
-    Returns:
-        str: The extracted text content from the PDF.
-    """
-    try:
-        with open(path, 'rb') as f:
-            reader = PyPDF2.PdfReader(f)
-            # Extract text from each page and concatenate
-            return "".join(page.extract_text() or "" for page in reader.pages)
-    except FileNotFoundError:
-        print(f"Error: PDF file not found at {path}")
-        return ""
-    except Exception as e:
-        print(f"An error occurred while reading the PDF: {e}")
-        return ""
+# Instructions sent alongside the uploaded 10-K PDF
+PROMPT_INSTRUCTIONS = (
+    'Analyze the attached annual report (10-K) and fill the data model based on it. '
+    'The output needs to be in a JSON format matching the provided schema. No extra fields allowed!'
+)
 
 # Define the Pydantic model for the Annual Report data structure
 class AnnualReport(BaseModel):
@@ -56,64 +47,70 @@ class AnnualReport(BaseModel):
     risk_factors: Optional[List[str]] = Field(None, description="Key risk factors (Item 1A)")
     management_discussion: Optional[str] = Field(None, description="Management’s Discussion & Analysis (Item 7)")
 
-# Helper function to recursively clean the schema for API compatibility
+# Compiled validator for AnnualReport, built once and reused for every response
+REPORT_ADAPTER = TypeAdapter(AnnualReport)
+
+# Keywords the Gemini API rejects in a response schema
+BLOCKED_SCHEMA_KEYS = frozenset({'title', 'description', '$ref', '$defs'})
+# Keywords dropped from the non-null member of an 'anyOf'
+BLOCKED_ANYOF_KEYS = frozenset({'title', 'description'})
+
+# Helper function to clean the schema for API compatibility
 def clean_schema(schema: dict) -> dict:
     """
-    Recursively processes a JSON schema to remove unsupported keywords
-    and flatten 'anyOf' for Optional types into 'nullable: true'.
+    Walks a JSON schema to remove unsupported keywords and flatten
+    'anyOf' for Optional types into 'nullable: true'.
+
+    The walk uses an explicit stack instead of recursion, filling each
+    cleaned container in place as its source node is visited.
     """
-    if isinstance(schema, dict):
-        cleaned = {}
-        if 'anyOf' in schema:
-            # Handle Optional types: flatten anyOf to type + nullable
-            for item in schema['anyOf']:
-                if item.get('type') == 'null':
+    root = [None]
+    # Each entry is (cleaned parent container, key or index in it, source node)
+    stack = [(root, 0, schema)]
+    while stack:
+        parent, key, node = stack.pop()
+        if isinstance(node, dict):
+            cleaned = {}
+            parent[key] = cleaned
+            if 'anyOf' in node:
+                # Handle Optional types: flatten anyOf to type + nullable
+                items = [item for item in node['anyOf'] if item.get('type') != 'null']
+                if len(items) < len(node['anyOf']):
                     cleaned['nullable'] = True
-                else:
-                    # Take the first non-null type definition
-                    for k, v in item.items():
-                        if k not in ['title', 'description']: # Still remove these from nested types
-                            cleaned[k] = clean_schema(v)
+                blocked = BLOCKED_ANYOF_KEYS
+            else:
+                items = [node]
+                blocked = BLOCKED_SCHEMA_KEYS
+            children = [(cleaned, k, v) for item in items for k, v in item.items() if k not in blocked]
+            # Push in reverse so keys are inserted in their original order
+            stack.extend(reversed(children))
+        elif isinstance(node, list):
+            cleaned = [None] * len(node)
+            parent[key] = cleaned
+            stack.extend((cleaned, i, elem) for i, elem in enumerate(node))
         else:
-            for k, v in schema.items():
-                if k not in ['title', 'description', '$ref', '$defs']: # Remove common problematic keywords
-                    cleaned[k] = clean_schema(v)
-        return cleaned
-    elif isinstance(schema, list):
-        return [clean_schema(elem) for elem in schema]
-    else:
-        return schema
-
-# Custom JSON serializer for datetime objects
-def json_serial(obj):
-    """Serializes datetime objects to ISO 8601 format."""
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    raise TypeError(f"Object of type {obj.__class__.__name__} is not JSON serializable")
+            parent[key] = node
+    return root[0]
 
-# --- Main execution flow ---
-if __name__ == "__main__":
-    # Load the text from your PDF file
-    # Make sure 'meta_10k.pdf' exists in the same directory as this script
-    text = load_file('meta_10k.pdf')
-
-    if not text:
-        print("Exiting due to empty or unreadable PDF content.")
-        exit()
+@cache
+def get_api_schema() -> dict:
+    """
+    Returns the cleaned AnnualReport schema to send to the Gemini API.
 
-    # Get the API key from environment variables
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
-        print("Error: GEMINI_API_KEY environment variable not set.")
-        print("Please create a .env file in the script's directory with GEMINI_API_KEY='YOUR_API_KEY'.")
-        exit()
-    
-    # Configure the google.generativeai library with the API key
-    genai.configure(api_key=api_key)
+    The schema is read from SCHEMA_CACHE_PATH when that file is newer than
+    this script; otherwise it is rebuilt from the Pydantic model and written
+    back to SCHEMA_CACHE_PATH.
+    """
+    try:
+        if os.path.getmtime(SCHEMA_CACHE_PATH) >= os.path.getmtime(__file__):
+            with open(SCHEMA_CACHE_PATH, 'r', encoding='utf-8') as f:
+                return json.load(f)
+    except (OSError, ValueError):
+        pass
 
     # Get the JSON schema from the Pydantic model
     raw_schema = AnnualReport.model_json_schema()
-    
+
     # Construct the base schema for the API to be very specific and minimal.
     api_schema_base = {
         "type": raw_schema.get("type", "object"),
@@ -121,83 +118,180 @@ if __name__ == "__main__":
     }
     if "required" in raw_schema:
         api_schema_base["required"] = raw_schema["required"]
-    
-    # Recursively clean the schema to remove all problematic fields and flatten 'anyOf'
+
+    # Clean the schema to remove all problematic fields and flatten 'anyOf'
     api_schema = clean_schema(api_schema_base)
 
-    # Construct the prompt for the Gemini model
-    prompt = f'Analyze the annual report (10-K) and fill the data model based on it:\n\n{text}\n\n'
-    prompt += 'The output needs to be in a JSON format matching the provided schema. No extra fields allowed!'
+    try:
+        with open(SCHEMA_CACHE_PATH, 'w', encoding='utf-8') as f:
+            json.dump(api_schema, f)
+    except OSError:
+        pass
+    return api_schema
+
+def print_report(ar: AnnualReport) -> None:
+    """
+    Prints an AnnualReport to stdout as indented JSON.
+
+    orjson serializes datetime fields to ISO 8601 natively and returns
+    bytes, which are written straight to the underlying stdout buffer.
+    """
+    sys.stdout.flush()
+    sys.stdout.buffer.write(orjson.dumps(ar.model_dump(), option=orjson.OPT_INDENT_2) + b"\n")
+    sys.stdout.buffer.flush()
+
+# Maps spaces and characters that are invalid in file names to underscores
+FILENAME_TABLE = str.maketrans({c: "_" for c in ' /\\:*?"<>|'})
+
+# Optional "Financials" entries: (AnnualReport field, label, value format)
+FINANCIAL_FIELDS = (
+    ('total_revenue', 'Total Revenue', '${:,.2f}'),
+    ('net_income', 'Net Income', '${:,.2f}'),
+    ('total_assets', 'Total Assets', '${:,.2f}'),
+    ('total_liabilities', 'Total Liabilities', '${:,.2f}'),
+    ('operating_cash_flow', 'Operating Cash Flow', '${:,.2f}'),
+    ('cash_and_equivalents', 'Cash & Equivalents', '${:,.2f}'),
+    ('num_employees', 'Number of Employees', '{}'),
+    ('auditor', 'Auditor', '{}'),
+)
+
+def write_report(ar: AnnualReport) -> str:
+    """
+    Renders an extracted AnnualReport to a PDF in the current directory.
+
+    Args:
+        ar (AnnualReport): The validated annual report data.
+
+    Returns:
+        str: The filename of the generated PDF.
+    """
+    # Imported here so the PDF backend is only loaded once there is a
+    # report to write
+    from reportlab.lib.styles import getSampleStyleSheet
+    from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer
+
+    styles = getSampleStyleSheet()
+    story = []
+
+    def add(text: str, style: str = "BodyText", bullet: bool = False):
+        # Append a paragraph of ReportLab markup followed by a small gap
+        story.append(Paragraph(text, styles[style], bulletText="\u2022" if bullet else None))
+        story.append(Spacer(1, 6))
+
+    def add_field(label: str, value: str, bullet: bool = False):
+        # Escape extracted text so characters like '&' render literally
+        add(f"<b>{escape(label, quote=False)}:</b> {escape(value, quote=False)}", bullet=bullet)
+
+    # Build the report straight into ReportLab flowables
+    add(escape(f"{ar.company_name} Annual Report {ar.fiscal_year_end.year}", quote=False), "Title")
+    add_field("CIK", ar.cik)
+    add_field("Fiscal Year End", ar.fiscal_year_end.strftime('%Y-%m-%d'))
+    add_field("Filing Date", ar.filing_date.strftime('%Y-%m-%d'))
+
+    add("Financials", "Heading2")
+    for field, label, fmt in FINANCIAL_FIELDS:
+        value = getattr(ar, field)
+        if value is not None and value != "":
+            add_field(label, fmt.format(value), bullet=True)
+
+    if ar.business_description:
+        add("Business Description", "Heading2")
+        add(escape(ar.business_description, quote=False))
+    if ar.risk_factors:
+        add("Risk Factors", "Heading2")
+        for rf in ar.risk_factors:
+            add(escape(rf, quote=False), bullet=True)
+    if ar.management_discussion:
+        add("Management Discussion &amp; Analysis", "Heading2")
+        add(escape(ar.management_discussion, quote=False))
+
+    # Prepare filename
+    company = ar.company_name.translate(FILENAME_TABLE) # Replace spaces and invalid characters for valid filename
+    filename = f"annual_report_{company}_{ar.fiscal_year_end.year}.pdf"
+
+    print(f"\nGenerating PDF: {filename}...")
+    SimpleDocTemplate(filename).build(story)
+    print(f"PDF generated successfully at {os.path.abspath(filename)}")
+    return filename
+
+async def process(path: str, model, semaphore: asyncio.Semaphore) -> None:
+    """
+    Extracts one annual report with Gemini and writes its PDF summary.
+
+    Args:
+        path (str): The file path to the 10-K PDF document.
+        model (genai.GenerativeModel): The configured Gemini model.
+        semaphore (asyncio.Semaphore): Limits how many reports are in
+            flight with the API at once.
+    """
+    # Already loaded by the main execution flow before any report is processed
+    import google.generativeai as genai
 
     try:
-        # Instantiate the GenerativeModel
-        model = genai.GenerativeModel('gemini-2.0-flash')
-        
-        # Call the Gemini model to generate structured content
-        response = model.generate_content(
-            contents=prompt,
-            generation_config={
-                'response_mime_type': 'application/json',
-                'response_schema': api_schema, # Pass the specifically constructed and cleaned minimal schema here
-            }
-        )
+        async with semaphore:
+            # Upload the PDF once and let Gemini parse it natively, instead of
+            # inlining the extracted text in the prompt. The upload call is
+            # blocking, so it runs in a worker thread.
+            uploaded = await asyncio.to_thread(genai.upload_file, path=path, mime_type='application/pdf')
+
+            # Call the Gemini model to generate structured content
+            response = await model.generate_content_async(
+                contents=[uploaded, PROMPT_INSTRUCTIONS],
+                generation_config={
+                    'response_mime_type': 'application/json',
+                    'response_schema': get_api_schema(), # Pass the specifically constructed and cleaned minimal schema here
+                }
+            )
 
         # Validate the response against the Pydantic model
-        ar = AnnualReport.model_validate_json(response.text)
-        print("Successfully extracted Annual Report data:")
-        # Use the custom json_serial function to handle datetime objects
-        print(json.dumps(ar.model_dump(), indent=2, default=json_serial)) # Fix applied here
-
-        # Convert the extracted data to Markdown format
-        md_lines = [
-            f"# {ar.company_name} Annual Report {ar.fiscal_year_end.year}",
-            f"**CIK:** {ar.cik}",
-            f"**Fiscal Year End:** {ar.fiscal_year_end.strftime('%Y-%m-%d')}",
-            f"**Filing Date:** {ar.filing_date.strftime('%Y-%m-%d')}",
-            "\n## Financials" # Added newline for better Markdown rendering
-        ]
-
-        if ar.total_revenue is not None:
-            md_lines.append(f"- **Total Revenue:** ${ar.total_revenue:,.2f}")
-        if ar.net_income is not None:
-            md_lines.append(f"- **Net Income:** ${ar.net_income:,.2f}")
-        if ar.total_assets is not None:
-            md_lines.append(f"- **Total Assets:** ${ar.total_assets:,.2f}")
-        if ar.total_liabilities is not None:
-            md_lines.append(f"- **Total Liabilities:** ${ar.total_liabilities:,.2f}")
-        if ar.operating_cash_flow is not None:
-            md_lines.append(f"- **Operating Cash Flow:** ${ar.operating_cash_flow:,.2f}")
-        if ar.cash_and_equivalents is not None:
-            md_lines.append(f"- **Cash & Equivalents:** ${ar.cash_and_equivalents:,.2f}")
-        if ar.num_employees is not None:
-            md_lines.append(f"- **Number of Employees:** {ar.num_employees}")
-        if ar.auditor:
-            md_lines.append(f"- **Auditor:** {ar.auditor}")
-
-        if ar.business_description:
-            md_lines += ["\n## Business Description", ar.business_description]
-        if ar.risk_factors:
-            md_lines += ["\n## Risk Factors"] + [f"- {rf}" for rf in ar.risk_factors]
-        if ar.management_discussion:
-            md_lines += ["\n## Management Discussion & Analysis", ar.management_discussion]
-
-        # Join Markdown lines with two line breaks for proper paragraph separation
-        md = "\n\n".join(md_lines)
-        
-        # Convert Markdown to HTML
-        html = markdown(md)
-        
-        # Prepare filename
-        company = ar.company_name.replace(" ", "_").replace("/", "_") # Replace spaces and slashes for valid filename
-        filename = f"annual_report_{company}_{ar.fiscal_year_end.year}.pdf"
-        
-        # Convert HTML to PDF using WeasyPrint
-        print(f"\nGenerating PDF: {filename}...")
-        HTML(string=html).write_pdf(filename)
-        print(f"PDF generated successfully at {os.path.abspath(filename)}")
+        ar = REPORT_ADAPTER.validate_json(response.text)
+        print(f"Successfully extracted Annual Report data from {path}:")
+        print_report(ar)
+
+        write_report(ar)
 
     except genai.types.BlockedPromptException as e:
-        print(f"The prompt was blocked by the safety system: {e}")
+        print(f"The prompt for {path} was blocked by the safety system: {e}")
     except Exception as e:
-        print(f"An unexpected error occurred during Gemini API call or data processing: {e}")
+        print(f"An unexpected error occurred during Gemini API call or data processing for {path}: {e}")
+
+async def process_all(paths: List[str], model) -> None:
+    """
+    Processes several annual reports concurrently.
+
+    Args:
+        paths (List[str]): File paths to the 10-K PDF documents.
+        model (genai.GenerativeModel): The configured Gemini model.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    await asyncio.gather(*(process(path, model, semaphore) for path in paths))
+
+# --- Main execution flow ---
+if __name__ == "__main__":
+    # PDF paths may be given on the command line; by default 'meta_10k.pdf'
+    # in the same directory as this script is processed
+    pdf_paths = sys.argv[1:] or ['meta_10k.pdf']
+
+    missing = [path for path in pdf_paths if not os.path.isfile(path)]
+    if missing:
+        print(f"Error: PDF file(s) not found: {', '.join(missing)}")
+        exit()
+
+    # Get the API key from environment variables
+    api_key = os.getenv('GEMINI_API_KEY')
+    if not api_key:
+        print("Error: GEMINI_API_KEY environment variable not set.")
+        print("Please create a .env file in the script's directory with GEMINI_API_KEY='YOUR_API_KEY'.")
+        exit()
+    
+    # Imported only once the API key is known, since the SDK is slow to load
+    # and isn't needed by scripts that just reuse this module's helpers
+    import google.generativeai as genai
+
+    # Configure the google.generativeai library with the API key
+    genai.configure(api_key=api_key)
+
+    # Instantiate the GenerativeModel
+    model = genai.GenerativeModel('gemini-2.0-flash')
 
+    asyncio.run(process_all(pdf_paths, model))